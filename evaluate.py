@@ -6,7 +6,6 @@ import imageio
 import numpy as np
 
 from tqdm import tqdm
-from PIL import Image
 
 import modules.midas.utils as utils
 
@@ -16,6 +15,47 @@ import metrics
 import matplotlib.pyplot as plt
 from utils_eval import param_sweep_shift, param_sweep_scale, compute_ls_solution
 
+def identity_collate(sample):
+    # keep samples as numpy arrays, the pipeline expects numpy inputs
+    return sample
+
+class VOIDDataset(torch.utils.data.Dataset):
+    def __init__(self, dataset_path, image_list, min_depth, max_depth):
+        self.dataset_path = dataset_path
+        self.image_list = image_list
+        self.min_depth, self.max_depth = min_depth, max_depth
+
+    def __len__(self):
+        return len(self.image_list)
+
+    def __getitem__(self, index):
+        # image
+        input_image_fp = os.path.join(self.dataset_path, self.image_list[index])
+        input_image = utils.read_image(input_image_fp)
+
+        # sparse depth
+        input_sparse_depth_fp = input_image_fp.replace("image", "sparse_depth")
+        input_sparse_depth = utils.read_depth(input_sparse_depth_fp)
+
+        # target (ground truth) depth
+        target_depth_fp = input_image_fp.replace("image", "ground_truth")
+        target_depth = utils.read_depth(target_depth_fp)
+
+        # target depth valid/mask
+        mask = (target_depth < self.max_depth)
+        if self.min_depth is not None:
+            mask &= (target_depth > self.min_depth)
+        target_depth = np.reciprocal( # invalid depth is set to zero
+            target_depth, out=np.zeros_like(target_depth), where=mask
+        )
+
+        return {
+            "image"        : input_image,
+            "sparse_depth" : input_sparse_depth,
+            "target_depth" : target_depth,
+            "mask"         : mask,
+        }
+
 def get_ls_solution(depth_infer, input_sparse_depth, validity_map, min_pred, max_pred, max_depth, min_depth, mask, target_depth):
 
     input_sparse_depth_valid = (input_sparse_depth < max_depth) * (input_sparse_depth > min_depth)
@@ -24,20 +64,27 @@ def get_ls_solution(depth_infer, input_sparse_depth, validity_map, min_pred, max
         input_sparse_depth_valid *= validity_map.astype(np.bool)
 
     input_sparse_depth_valid = input_sparse_depth_valid.astype(bool)
-    input_sparse_depth[~input_sparse_depth_valid] = np.inf # set invalid depth
-    input_sparse_depth = 1.0 / input_sparse_depth
+    input_sparse_depth = np.reciprocal( # invalid depth is set to zero
+        input_sparse_depth, out=np.zeros_like(input_sparse_depth), where=input_sparse_depth_valid
+    )
 
     scaled_depth, scale_ls, shift_ls = compute_ls_solution(depth_infer, input_sparse_depth, input_sparse_depth_valid, min_pred, max_pred)
     
     error_w_int_depth_ls = metrics.ErrorMetrics()
-    error_w_int_depth_ls.compute(scaled_depth, target_depth, mask.astype(bool))
+    error_w_int_depth_ls.compute(scaled_depth, target_depth, mask)
     rmse_ls = error_w_int_depth_ls.rmse
     return rmse_ls, scale_ls, shift_ls
 
-def evaluate(dataset_path, depth_predictor, nsamples, sml_model_path):
+def evaluate(dataset_path, depth_predictor, nsamples, sml_model_path, compile_models=False, use_amp=False, 
+             bilinear_upsample=False, channels_last=False):
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     print("device: %s" % device)
 
+    # let cuDNN pick the fastest conv algorithms for the input sizes;
+    # algorithm choice may vary between runs, so this is opt-in
+    if channels_last:
+        torch.backends.cudnn.benchmark = True
+
     # ranges for VOID
     min_depth, max_depth = 0.2, 5.0
     min_pred, max_pred = 0.1, 8.0
@@ -45,7 +92,9 @@ def evaluate(dataset_path, depth_predictor, nsamples, sml_model_path):
     # instantiate method
     method = pipeline.VIDepth(
         depth_predictor, nsamples, sml_model_path, 
-        min_pred, max_pred, min_depth, max_depth, device
+        min_pred, max_pred, min_depth, max_depth, device, 
+        compile_models=compile_models, use_amp=use_amp, 
+        bilinear_upsample=bilinear_upsample, channels_last=channels_last
     )
 
     # get inputs
@@ -56,20 +105,21 @@ def evaluate(dataset_path, depth_predictor, nsamples, sml_model_path):
     avg_error_w_int_depth = metrics.ErrorMetricsAverager()
     avg_error_w_pred = metrics.ErrorMetricsAverager()
     ls_rmse = []; shift_optimized_rmse = []; scale_optimized_rmse = []; best_scale_shift_rmse = []
-    # iterate through inputs list
-    for i in tqdm(range(len(test_image_list))):
-        
-        # image
-        input_image_fp = os.path.join(dataset_path, test_image_list[i])
-        input_image = utils.read_image(input_image_fp)
-
-        # sparse depth
-        input_sparse_depth_fp = input_image_fp.replace("image", "sparse_depth")
-        input_sparse_depth = np.array(Image.open(input_sparse_depth_fp), dtype=np.float32) / 256.0
-        input_sparse_depth[input_sparse_depth <= 0] = 0.0
+    # decode and preprocess inputs in background workers while the pipeline runs
+    loader = torch.utils.data.DataLoader(
+        VOIDDataset(dataset_path, test_image_list, min_depth, max_depth),
+        batch_size=None,
+        num_workers=min(8, os.cpu_count() or 1),
+        prefetch_factor=2,
+        collate_fn=identity_collate,
+    )
 
-        #plt.imshow(input_sparse_depth)
-        #plt.show()
+    # iterate through inputs list
+    for i, sample in enumerate(tqdm(loader)):
+        input_image = sample["image"]
+        input_sparse_depth = sample["sparse_depth"]
+        target_depth = sample["target_depth"]
+        mask = sample["mask"]
 
         # sparse depth validity map
         # validity_map_fp = input_image_fp.replace("image", "validity_map")
@@ -80,38 +130,23 @@ def evaluate(dataset_path, depth_predictor, nsamples, sml_model_path):
         #plt.imshow(validity_map)
         #plt.show()
 
-        # target (ground truth) depth
-        target_depth_fp = input_image_fp.replace("image", "ground_truth")
-        target_depth = np.array(Image.open(target_depth_fp), dtype=np.float32) / 256.0
-        target_depth[target_depth <= 0] = 0.0
-
-        #plt.imshow(target_depth)
-        #plt.show()
-
-        # target depth valid/mask
-        mask = (target_depth < max_depth)
-        if min_depth is not None:
-            mask *= (target_depth > min_depth)
-        target_depth[~mask] = np.inf  # set invalid depth
-        target_depth = 1.0 / target_depth
-
         # run pipeline
         output = method.run(input_image, input_sparse_depth, validity_map, device)
 
-        # run param sweep
-        depth_infer = method.infer_depth(input_image)
+        # run param sweep, reusing the depth prediction from the pipeline
+        depth_infer = output["depth_pred"]
         
-        rmse_ls, scale_ls, shift_ls = get_ls_solution(depth_infer, input_sparse_depth, validity_map, min_pred, max_pred, max_depth, min_depth, mask.astype(bool), target_depth)
+        rmse_ls, scale_ls, shift_ls = get_ls_solution(depth_infer, input_sparse_depth, validity_map, min_pred, max_pred, max_depth, min_depth, mask, target_depth)
         ls_rmse.append(rmse_ls)
         print("Ls Shift: ", shift_ls, "Ls Scale: ", scale_ls, "Ls RMSE: ", rmse_ls)
 
         #optimize shift
-        best_shift, best_shift_rmse = param_sweep_shift(shift_ls, scale_ls, depth_infer, target_depth, mask.astype(bool), rmse_ls, i)
+        best_shift, best_shift_rmse = param_sweep_shift(shift_ls, scale_ls, depth_infer, target_depth, mask, rmse_ls, i)
         print(f"Optimizing Shift alone: {best_shift}, RMSE: {best_shift_rmse}")
         shift_optimized_rmse.append(best_shift_rmse)
 
         #optimize scale
-        best_scale, best_scale_rmse = param_sweep_scale(scale_ls, shift_ls, depth_infer, target_depth, mask.astype(bool), rmse_ls, i)
+        best_scale, best_scale_rmse = param_sweep_scale(scale_ls, shift_ls, depth_infer, target_depth, mask, rmse_ls, i)
         print(f"Optimizing Scale alone: {best_scale}, RMSE: {best_scale_rmse}")
         scale_optimized_rmse.append(best_scale_rmse)
         
@@ -125,7 +160,7 @@ def evaluate(dataset_path, depth_predictor, nsamples, sml_model_path):
         error_w_int_depth.compute(
             estimate = output["ga_depth"], 
             target = target_depth, 
-            valid = mask.astype(bool),
+            valid = mask,
         )
 
         # compute error metrics using SML output depth
@@ -133,7 +168,7 @@ def evaluate(dataset_path, depth_predictor, nsamples, sml_model_path):
         error_w_pred.compute(
             estimate = output["sml_depth"], 
             target = target_depth, 
-            valid = mask.astype(bool),
+            valid = mask,
         )
 
         # accumulate error metrics
@@ -182,6 +217,18 @@ if __name__=="__main__":
                         help='Number of sparse metric depth samples available.')
     parser.add_argument('-sm', '--sml-model-path', type=str, default='', 
                         help='/home/saimouli/Documents/github/VI_Depth_sai/weights/sml_model.dpredictor.midas_small.nsamples.150.ckpt')
+    parser.add_argument('--compile', dest='compile_models', action='store_true', 
+                        help='Compile models with torch.compile (PyTorch 2.0+).')
+    parser.set_defaults(compile_models=False)
+    parser.add_argument('--amp', dest='use_amp', action='store_true', 
+                        help='Run depth predictor and SML with mixed precision on CUDA.')
+    parser.set_defaults(use_amp=False)
+    parser.add_argument('--bilinear-upsample', dest='bilinear_upsample', action='store_true', 
+                        help='Upsample depth predictions bilinearly instead of bicubically (faster, changes outputs).')
+    parser.set_defaults(bilinear_upsample=False)
+    parser.add_argument('--channels-last', dest='channels_last', action='store_true', 
+                        help='Run SML in channels_last layout with cuDNN benchmarking on CUDA.')
+    parser.set_defaults(channels_last=False)
 
     args = parser.parse_args()
     print(args)
@@ -191,6 +238,10 @@ if __name__=="__main__":
         args.depth_predictor, 
         args.nsamples, 
         args.sml_model_path,
+        args.compile_models,
+        args.use_amp,
+        args.bilinear_upsample,
+        args.channels_last,
     )
 
     # to test on classroom
@@ -35,14 +35,16 @@ class ErrorMetrics(object):
         target = 1.0/target
 
         # depth error, estimate in meters, convert units to mm
-        self.rmse = rmse(1000.0*estimate, 1000.0*target)
-        self.mae = mae(1000.0*estimate, 1000.0*target)
-        self.absrel = absrel(1000.0*estimate, 1000.0*target)
+        estimate_mm, target_mm = 1000.0*estimate, 1000.0*target
+        self.rmse = rmse(estimate_mm, target_mm)
+        self.mae = mae(estimate_mm, target_mm)
+        self.absrel = absrel(estimate_mm, target_mm)
 
         # inverse depth error, estimate in meters, convert units to 1/km
-        self.inv_rmse = inv_rmse(0.001*estimate, 0.001*target)
-        self.inv_mae = inv_mae(0.001*estimate, 0.001*target)
-        self.inv_absrel = inv_absrel(0.001*estimate, 0.001*target)
+        estimate_km, target_km = 0.001*estimate, 0.001*target
+        self.inv_rmse = inv_rmse(estimate_km, target_km)
+        self.inv_mae = inv_mae(estimate_km, target_km)
+        self.inv_absrel = inv_absrel(estimate_km, target_km)
 
 class ErrorMetricsAverager(object):
     def __init__(self):
@@ -1,11 +1,19 @@
+from functools import lru_cache
+
 import numpy as np
 np.set_printoptions(suppress=True)
 
 from scipy.interpolate import griddata
 
 
+# query grids keyed by map size, reused across samples of the same resolution
+@lru_cache(maxsize=4)
+def get_grid(rows, cols):
+    return np.mgrid[0:rows, 0:cols]
+
+
 def interpolate_knots(map_size, knot_coords, knot_values, interpolate, fill_corners):
-    grid_x, grid_y = np.mgrid[0:map_size[0], 0:map_size[1]]
+    grid_x, grid_y = get_grid(map_size[0], map_size[1])
 
     interpolated_map = griddata(
         points=knot_coords.T,
@@ -24,17 +32,12 @@ class Interpolator2D(object):
         self.valid = valid
 
         self.map_size = np.shape(pred_inv)
-        self.num_knots = np.sum(valid)
-        nonzero_y_loc = np.nonzero(valid)[0]
-        nonzero_x_loc = np.nonzero(valid)[1]
+        nonzero_y_loc, nonzero_x_loc = np.nonzero(valid)
+        self.num_knots = nonzero_y_loc.size
         self.knot_coords = np.stack((nonzero_x_loc, nonzero_y_loc))
         self.knot_scales = sparse_depth_inv[valid] / pred_inv[valid]
         self.knot_shifts = sparse_depth_inv[valid] - pred_inv[valid]
 
-        self.knot_list = []
-        for i in range(self.num_knots):
-            self.knot_list.append((int(self.knot_coords[0,i]), int(self.knot_coords[1,i])))
-
         # to be computed
         self.interpolated_map = None
         self.confidence_map = None
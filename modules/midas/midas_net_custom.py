@@ -86,6 +86,9 @@ class MidasNet_small_videpth(BaseModel):
         if path:
             self.load(path)
 
+        if self.channels_last==True:
+            self.to(memory_format=torch.channels_last)
+
 
     def forward(self, x, d):
         """Forward pass.
@@ -98,8 +101,7 @@ class MidasNet_small_videpth(BaseModel):
             tensor: depth
         """
         if self.channels_last==True:
-            print("self.channels_last = ", self.channels_last)
-            x.contiguous(memory_format=torch.channels_last)
+            x = x.contiguous(memory_format=torch.channels_last)
 
         layer_0 = self.first(x)
 
@@ -126,10 +128,10 @@ class MidasNet_small_videpth(BaseModel):
         # clamp pred to min and max
         if self.min_pred is not None:
             min_pred_inv = 1.0/self.min_pred
-            pred[pred > min_pred_inv] = min_pred_inv
+            pred = pred.clamp(max=min_pred_inv)
         if self.max_pred is not None:
             max_pred_inv = 1.0/self.max_pred
-            pred[pred < max_pred_inv] = max_pred_inv
+            pred = pred.clamp(min=max_pred_inv)
 
         # also return scales
         return (pred, scales)
\ No newline at end of file
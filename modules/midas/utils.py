@@ -114,6 +114,26 @@ def read_image(path):
     return img
 
 
+def read_depth(path):
+    """Read depth map stored as 16b PNG and output metric depth.
+
+    Args:
+        path (str): path to file
+
+    Returns:
+        array: depth map (float32), invalid depth set to 0
+    """
+    depth = cv2.imread(path, cv2.IMREAD_ANYDEPTH)
+
+    if depth is None:
+        raise FileNotFoundError(path)
+
+    depth = depth.astype(np.float32) * (1.0 / 256.0)
+    depth[depth <= 0] = 0.0
+
+    return depth
+
+
 def resize_image(img):
     """Resize image and make it fit for network.
 
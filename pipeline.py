@@ -11,7 +11,9 @@ from utils_eval import compute_ls_solution
 
 class VIDepth(object):
     def __init__(self, depth_predictor, nsamples, sml_model_path, 
-                min_pred, max_pred, min_depth, max_depth, device):
+                min_pred, max_pred, min_depth, max_depth, device, 
+                compile_models=False, use_amp=False, bilinear_upsample=False, 
+                channels_last=False):
 
         # get transforms
         model_transforms = transforms.get_transforms(depth_predictor, "void", str(nsamples))
@@ -43,6 +45,7 @@ class VIDepth(object):
             path=sml_model_path,
             min_pred=min_pred,
             max_pred=max_pred,
+            channels_last=(channels_last and torch.device(device).type == "cuda"),
         )
 
         # depth prediction ranges
@@ -55,10 +58,29 @@ class VIDepth(object):
         self.device = device
         self.DepthModel.eval()
         self.DepthModel.to(self.device)
+        self.DepthModel.requires_grad_(False)
 
         # eval mode
         self.ScaleMapLearner.eval()
         self.ScaleMapLearner.to(self.device)
+        self.ScaleMapLearner.requires_grad_(False)
+
+        # mixed precision for the depth and SML models, only used on CUDA
+        self.use_amp = use_amp and torch.device(device).type == "cuda"
+        self.amp_dtype = torch.float16
+        if self.use_amp and torch.cuda.is_bf16_supported():
+            self.amp_dtype = torch.bfloat16
+
+        # upsampling of depth predictions to input resolution; the released
+        # SML weights were trained on bicubic-upsampled predictions
+        self.depth_upsample_mode = "bilinear" if bilinear_upsample else "bicubic"
+
+        # compile models for fused kernels and CUDA graph capture
+        if compile_models:
+            if not hasattr(torch, "compile"):
+                raise RuntimeError("compiling models requires PyTorch 2.0 or later")
+            self.DepthModel = torch.compile(self.DepthModel, mode="reduce-overhead")
+            self.ScaleMapLearner = torch.compile(self.ScaleMapLearner, mode="reduce-overhead")
 
     def infer_depth(self, input_image):
         input_height, input_width = np.shape(input_image)[0], np.shape(input_image)[1]
@@ -68,13 +90,14 @@ class VIDepth(object):
         im = sample["image"].to(self.device)
 
         # run depth model
-        with torch.no_grad():
-            depth_pred = self.DepthModel.forward(im.unsqueeze(0))
+        with torch.inference_mode():
+            with torch.autocast("cuda", dtype=self.amp_dtype, enabled=self.use_amp):
+                depth_pred = self.DepthModel.forward(im.unsqueeze(0))
             depth_pred = (
                 torch.nn.functional.interpolate(
-                    depth_pred.unsqueeze(1),
+                    depth_pred.float().unsqueeze(1),
                     size=(input_height, input_width),
-                    mode="bicubic",
+                    mode=self.depth_upsample_mode,
                     align_corners=False,
                 )
                 .squeeze()
@@ -96,8 +119,9 @@ class VIDepth(object):
             input_sparse_depth_valid *= validity_map.astype(np.bool)
 
         input_sparse_depth_valid = input_sparse_depth_valid.astype(bool)
-        input_sparse_depth[~input_sparse_depth_valid] = np.inf # set invalid depth
-        input_sparse_depth = 1.0 / input_sparse_depth
+        input_sparse_depth = np.reciprocal( # invalid depth is set to zero
+            input_sparse_depth, out=np.zeros_like(input_sparse_depth), where=input_sparse_depth_valid
+        )
 
         # run depth model
         depth_pred = self.infer_depth(input_image)
@@ -143,16 +167,18 @@ class VIDepth(object):
 
         sample = {"image" : input_image, "int_depth" : int_depth, "int_scales" : int_scales, "int_depth_no_tf" : int_depth}
         sample = self.ScaleMapLearner_transform(sample)
-        x = torch.cat([sample["int_depth"], sample["int_scales"]], 0)
-        x = x.to(device)
-        d = sample["int_depth_no_tf"].to(device)
+        # copy SML inputs to device in a single transfer
+        xd = torch.cat([sample["int_depth"], sample["int_scales"], sample["int_depth_no_tf"]], 0)
+        xd = xd.to(device)
+        x, d = xd[:2], xd[2:]
 
         # run SML model
-        with torch.no_grad():
-            sml_pred, sml_scales = self.ScaleMapLearner.forward(x.unsqueeze(0), d.unsqueeze(0))
+        with torch.inference_mode():
+            with torch.autocast("cuda", dtype=self.amp_dtype, enabled=self.use_amp):
+                sml_pred, sml_scales = self.ScaleMapLearner.forward(x.unsqueeze(0), d.unsqueeze(0))
             sml_pred = (
                 torch.nn.functional.interpolate(
-                    sml_pred,
+                    sml_pred.float(),
                     size=(input_height, input_width),
                     mode="bicubic",
                     align_corners=False,
@@ -165,5 +191,6 @@ class VIDepth(object):
         output = {
             "ga_depth"  : int_depth, 
             "sml_depth" : sml_pred, 
+            "depth_pred": depth_pred,
         }
         return output
\ No newline at end of file
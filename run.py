@@ -3,9 +3,6 @@ import argparse
 import glob
 
 import torch
-import numpy as np
-
-from PIL import Image
 
 import modules.midas.utils as utils
 
@@ -17,22 +14,28 @@ def load_input_image(input_image_fp):
 
 
 def load_sparse_depth(input_sparse_depth_fp):
-    input_sparse_depth = np.array(Image.open(input_sparse_depth_fp), dtype=np.float32) / 256.0
-    input_sparse_depth[input_sparse_depth <= 0] = 0.0
-    return input_sparse_depth
+    return utils.read_depth(input_sparse_depth_fp)
 
 
 def run(depth_predictor, nsamples, sml_model_path, 
         min_pred, max_pred, min_depth, max_depth, 
-        input_path, output_path, save_output):
+        input_path, output_path, save_output, compile_models=False, use_amp=False, 
+        bilinear_upsample=False, channels_last=False):
     
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     print("device: %s" % device)
 
+    # let cuDNN pick the fastest conv algorithms for the input sizes;
+    # algorithm choice may vary between runs, so this is opt-in
+    if channels_last:
+        torch.backends.cudnn.benchmark = True
+
     # instantiate method
     method = pipeline.VIDepth(
         depth_predictor, nsamples, sml_model_path, 
-        min_pred, max_pred, min_depth, max_depth, device
+        min_pred, max_pred, min_depth, max_depth, device, 
+        compile_models=compile_models, use_amp=use_amp, 
+        bilinear_upsample=bilinear_upsample, channels_last=channels_last
     )
 
     # get inputs
@@ -108,6 +111,20 @@ if __name__=="__main__":
                             help='Save output depth map.')
     parser.set_defaults(save_output=False)
 
+    # runtime options
+    parser.add_argument('--compile', dest='compile_models', action='store_true', 
+                            help='Compile models with torch.compile (PyTorch 2.0+).')
+    parser.set_defaults(compile_models=False)
+    parser.add_argument('--amp', dest='use_amp', action='store_true', 
+                            help='Run depth predictor and SML with mixed precision on CUDA.')
+    parser.set_defaults(use_amp=False)
+    parser.add_argument('--bilinear-upsample', dest='bilinear_upsample', action='store_true', 
+                            help='Upsample depth predictions bilinearly instead of bicubically (faster, changes outputs).')
+    parser.set_defaults(bilinear_upsample=False)
+    parser.add_argument('--channels-last', dest='channels_last', action='store_true', 
+                            help='Run SML in channels_last layout with cuDNN benchmarking on CUDA.')
+    parser.set_defaults(channels_last=False)
+
     args = parser.parse_args()
     print(args)
     
@@ -121,5 +138,9 @@ if __name__=="__main__":
         args.max_depth,
         args.input_path,
         args.output_path,
-        args.save_output
+        args.save_output,
+        args.compile_models,
+        args.use_amp,
+        args.bilinear_upsample,
+        args.channels_last
     )
\ No newline at end of file
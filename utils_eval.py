@@ -1,6 +1,5 @@
 import numpy as np
 import matplotlib.pyplot as plt
-import metrics
 from modules.estimator import LeastSquaresEstimator
 
 def param_sweep(depth_infer, scale, shift):
@@ -8,21 +7,38 @@ def param_sweep(depth_infer, scale, shift):
     #inv_metric,_,_ = scale_up(depth_infer, sparse_depth, min_depth, max_depth)
     return inv_metric.astype(np.float32)
 
+def masked_sweep_inputs(depth_infer, gt_depth_inv, mask):
+    # gather valid pixels and convert target to depth in mm once per sweep
+    return depth_infer[mask], 1000.0*(1.0 / gt_depth_inv[mask])
+
+def param_sweep_rmse(depth_infer_valid, scales, shifts, target_mm, chunk_size=16):
+    # rmse of every (scale, shift) candidate, evaluated a chunk of candidates at a time;
+    # candidates are cast to float32 so the alignment matches param_sweep on a single pair
+    scales, shifts = np.broadcast_arrays(np.atleast_1d(scales), np.atleast_1d(shifts))
+    scales = scales.astype(np.float32)[:, None]
+    shifts = shifts.astype(np.float32)[:, None]
+
+    sweep_rmse = np.empty(scales.shape[0], dtype=np.float32)
+    for start in range(0, scales.shape[0], chunk_size):
+        end = start + chunk_size
+        estimate = 1.0 / param_sweep(depth_infer_valid, scales[start:end], shifts[start:end])
+        sweep_rmse[start:end] = np.sqrt(np.mean((1000.0*estimate - target_mm) ** 2, axis=1))
+    return sweep_rmse
+
 def param_sweep_shift(shift_ls, scale, depth_infer, gt_depth_inv, mask, rmse_ls, frame_idx, save_img = False):
-    best_shift = shift_ls; best_shift_rmse = rmse_ls; shift_rmse= []
+    best_shift = shift_ls; best_shift_rmse = rmse_ls
     min_counter = 0.03; max_counter = 0.03
-    for shift in np.linspace(shift_ls-min_counter, shift_ls+max_counter, num=500):
-        infer_metric_depth_inv = param_sweep(depth_infer, scale, shift)
-        error_w_int_depth = metrics.ErrorMetrics()
-        error_w_int_depth.compute(infer_metric_depth_inv, gt_depth_inv, mask)
-        shift_rmse.append(error_w_int_depth.rmse)
-        if error_w_int_depth.rmse < best_shift_rmse:
-            best_shift_rmse = error_w_int_depth.rmse
-            best_shift = shift
+    shifts = np.linspace(shift_ls-min_counter, shift_ls+max_counter, num=500)
+    depth_infer_valid, target_mm = masked_sweep_inputs(depth_infer, gt_depth_inv, mask)
+    shift_rmse = param_sweep_rmse(depth_infer_valid, scale, shifts, target_mm)
+    best_idx = np.argmin(shift_rmse)
+    if shift_rmse[best_idx] < best_shift_rmse:
+        best_shift_rmse = shift_rmse[best_idx]
+        best_shift = shifts[best_idx]
 
     #if save_img == True:
     plt.figure(1)
-    plt.plot(np.linspace(shift_ls-min_counter, shift_ls+max_counter, num=500), shift_rmse)
+    plt.plot(shifts, shift_rmse)
     plt.plot(shift_ls, rmse_ls, 'o')
     plt.plot(best_shift, best_shift_rmse, 'go')
     plt.legend(["RMSE", "LS"])
@@ -33,23 +49,18 @@ def param_sweep_shift(shift_ls, scale, depth_infer, gt_depth_inv, mask, rmse_ls,
 
 def param_sweep_scale(scale_ls, shift, depth_infer, gt_depth_inv, mask, rmse_ls, frame_idx, optim_shift=False, save_img = False):
     best_scale_rmse = rmse_ls; best_scale = scale_ls
-    scale_rmse = []
     min_counter = 0.00001; max_counter = 0.00003
     #min_counter = 0; max_counter = 0
-    for scale_iter in np.linspace(scale_ls-min_counter, scale_ls+max_counter, num=500):
-        #print(f"Scale: {scale_iter}, Shift: {shift}")
-        
-        infer_metric_depth_inv = param_sweep(depth_infer, scale_iter, shift)
-        error_w_int_depth = metrics.ErrorMetrics()
-        error_w_int_depth.compute(infer_metric_depth_inv, gt_depth_inv, mask)
-        #print("RMSE: ", error_w_int_depth.rmse)
-        scale_rmse.append(error_w_int_depth.rmse)
-        if error_w_int_depth.rmse < best_scale_rmse:
-            best_scale_rmse = error_w_int_depth.rmse
-            best_scale = scale_iter
+    scales = np.linspace(scale_ls-min_counter, scale_ls+max_counter, num=500)
+    depth_infer_valid, target_mm = masked_sweep_inputs(depth_infer, gt_depth_inv, mask)
+    scale_rmse = param_sweep_rmse(depth_infer_valid, scales, shift, target_mm)
+    best_idx = np.argmin(scale_rmse)
+    if scale_rmse[best_idx] < best_scale_rmse:
+        best_scale_rmse = scale_rmse[best_idx]
+        best_scale = scales[best_idx]
             
     plt.figure(2)
-    plt.plot(np.linspace(scale_ls-min_counter, scale_ls+max_counter, num=500), scale_rmse)
+    plt.plot(scales, scale_rmse)
     plt.plot(scale_ls, rmse_ls, 'o')
     plt.plot(best_scale, best_scale_rmse, 'go')
     plt.legend(["RMSE", "LS"])